@@ -2,24 +2,25 @@
 
 from __future__ import annotations
 
+import asyncio
 import os
-from dataclasses import asdict
+from dataclasses import fields
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Iterable, List, Optional, Set
 
 import discord
 from discord import app_commands
 from discord.ext import commands
-from zoneinfo import ZoneInfo
 
 from .config import ConfigManager, GuildConfig
-from .storage import StorageManager
+from .storage import BulkRecord, StorageManager, _tz
 
 DATA_DIR = Path("data")
 CONFIG_PATH = DATA_DIR / "configs.json"
 STORAGE_ROOT = DATA_DIR / "vault"
 BOT_VERSION = "0.1.0"
+BACKFILL_CHUNK_SIZE = 500
 
 
 class ObsidianBot(commands.Bot):
@@ -33,11 +34,19 @@ class ObsidianBot(commands.Bot):
         super().__init__(command_prefix="!", intents=intents)
         self.config_manager = ConfigManager(CONFIG_PATH)
         self.storage_manager = StorageManager(STORAGE_ROOT)
+        self.config_manager.add_listener(self.storage_manager.invalidate_guild)
 
     async def setup_hook(self) -> None:
+        self.config_manager.compact()
         self.tree.add_command(build_obsidian_group(self))
         await self.tree.sync()
 
+    async def close(self) -> None:
+        await self.storage_manager.flush()
+        await asyncio.to_thread(self.storage_manager.close)
+        self.config_manager.close()
+        await super().close()
+
     # ---------- permission helpers ----------
     def _has_permissions(self, interaction: discord.Interaction) -> bool:
         if not interaction.user or not isinstance(interaction.user, discord.Member):
@@ -57,8 +66,10 @@ class ObsidianBot(commands.Bot):
 
     # ---------- message listeners ----------
     async def on_message(self, message: discord.Message) -> None:
+        if message.author.bot:
+            return
         await super().on_message(message)
-        if message.author.bot or not message.guild:
+        if not message.guild:
             return
         config = self.config_manager.get(message.guild.id)
         if not self._should_log(config, message.channel.id):
@@ -88,30 +99,52 @@ class ObsidianBot(commands.Bot):
             return False
         return True
 
-    async def _persist_message(self, config: GuildConfig, message: discord.Message, event: str = "message") -> None:
-        attachments = [attachment.url for attachment in message.attachments]
-        content = message.clean_content
-        author = f"@{message.author.display_name}"
+    def _message_record(self, message: discord.Message, event: str = "message") -> BulkRecord:
         channel_name = (
             message.channel.name
             if isinstance(message.channel, discord.abc.GuildChannel)
             else str(message.channel.id)
         )
-        self.storage_manager.append_message(
-            config,
+        return BulkRecord(
             channel_name=channel_name,
             message_id=message.id,
-            author=author,
-            content=content,
+            author=f"@{message.author.display_name}",
+            content=message.clean_content,
             timestamp=message.created_at,
-            attachments=attachments,
+            attachments=[attachment.url for attachment in message.attachments],
             event=event,
         )
 
+    async def _persist_message(self, config: GuildConfig, message: discord.Message, event: str = "message") -> None:
+        record = self._message_record(message, event)
+        append = self.storage_manager.append_message_async
+        if config.storage_format == "msgpack" and self.storage_manager.binary_supported:
+            append = self.storage_manager.append_message_binary
+        await append(
+            config,
+            channel_name=record.channel_name,
+            message_id=record.message_id,
+            author=record.author,
+            content=record.content,
+            timestamp=record.timestamp,
+            attachments=record.attachments,
+            event=record.event,
+        )
+
     # ---------- helpers ----------
-    async def _send_zip(self, interaction: discord.Interaction, *, paths: Iterable[Path], label: str) -> None:
-        buffer = self.storage_manager.zip_paths(paths)
-        await interaction.followup.send(file=discord.File(buffer, filename=f"{label}.zip"))
+    async def _prepare_vault(self, config: GuildConfig) -> None:
+        await self.storage_manager.flush()
+        await asyncio.to_thread(self.storage_manager.render_binary_logs, config)
+
+    async def _send_zip(
+        self, interaction: discord.Interaction, config: GuildConfig, *, paths: Iterable[Path], label: str
+    ) -> None:
+        await self.storage_manager.flush()
+        buffer = await asyncio.to_thread(self.storage_manager.zip_paths, config, paths)
+        try:
+            await interaction.followup.send(file=discord.File(buffer, filename=f"{label}.zip"))
+        finally:
+            buffer.close()
 
 
 def build_obsidian_group(bot: ObsidianBot) -> app_commands.Group:
@@ -128,10 +161,13 @@ def build_obsidian_group(bot: ObsidianBot) -> app_commands.Group:
             await interaction.response.send_message("This command can only be used in a guild.", ephemeral=True)
             return
         config = bot.config_manager.get(guild.id)
-        data = asdict(config)
         lines = ["**Current Configuration**"]
-        for key, value in data.items():
-            lines.append(f"- `{key}`: {value}")
+        for config_field in fields(config):
+            value = getattr(config, config_field.name)
+            if isinstance(value, set):
+                # Channel filters are sets; show them as the sorted lists they were.
+                value = sorted(value)
+            lines.append(f"- `{config_field.name}`: {value}")
         await interaction.response.send_message("\n".join(lines), ephemeral=True)
 
     @config_group.command(name="set_export_mode")
@@ -150,6 +186,27 @@ def build_obsidian_group(bot: ObsidianBot) -> app_commands.Group:
         bot.config_manager.update(guild.id, export_mode=mode, custom_period_days=custom_days or 7)
         await interaction.response.send_message(f"Export mode set to {mode}.", ephemeral=True)
 
+    @config_group.command(name="set_storage_format")
+    @app_commands.describe(storage_format="markdown (written immediately) or msgpack (rendered on export)")
+    async def config_set_storage_format(interaction: discord.Interaction, storage_format: str) -> None:
+        bot._require_permissions(interaction)
+        guild = interaction.guild
+        if guild is None:
+            await interaction.response.send_message("Use this command inside a guild.", ephemeral=True)
+            return
+        if storage_format not in {"markdown", "msgpack"}:
+            await interaction.response.send_message("Invalid storage format.", ephemeral=True)
+            return
+        if storage_format == "msgpack" and not bot.storage_manager.binary_supported:
+            await interaction.response.send_message("Install `msgpack` to enable binary storage.", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True)
+        config = bot.config_manager.get(guild.id)
+        if config.storage_format == "msgpack" and storage_format == "markdown":
+            await bot._prepare_vault(config)
+        bot.config_manager.update(guild.id, storage_format=storage_format)
+        await interaction.followup.send(f"Storage format set to {storage_format}.", ephemeral=True)
+
     @config_group.command(name="set_timezone")
     async def config_set_timezone(interaction: discord.Interaction, timezone_name: str) -> None:
         bot._require_permissions(interaction)
@@ -158,7 +215,7 @@ def build_obsidian_group(bot: ObsidianBot) -> app_commands.Group:
             await interaction.response.send_message("Use this command inside a guild.", ephemeral=True)
             return
         try:
-            ZoneInfo(timezone_name)
+            _tz(timezone_name)
         except Exception:
             await interaction.response.send_message("Invalid timezone.", ephemeral=True)
             return
@@ -221,10 +278,18 @@ def build_obsidian_group(bot: ObsidianBot) -> app_commands.Group:
             await interaction.response.send_message("Use this command inside a guild.", ephemeral=True)
             return
         config = bot.config_manager.get(interaction.guild_id)
+        await bot.storage_manager.flush()
         count = 0
+        records: List[BulkRecord] = []
         async for message in channel.history(limit=limit, oldest_first=True):
-            await bot._persist_message(config, message)
-            count += 1
+            records.append(bot._message_record(message))
+            if len(records) >= BACKFILL_CHUNK_SIZE:
+                await asyncio.to_thread(bot.storage_manager.bulk_append, config, records)
+                count += len(records)
+                records = []
+        if records:
+            await asyncio.to_thread(bot.storage_manager.bulk_append, config, records)
+            count += len(records)
         await interaction.followup.send(f"Backfilled {count} messages from {channel.mention}.", ephemeral=True)
 
     @config_group.command(name="set_filename_template")
@@ -248,14 +313,16 @@ def build_obsidian_group(bot: ObsidianBot) -> app_commands.Group:
         if interaction.guild_id is None:
             await interaction.response.send_message("Use this command inside a guild.", ephemeral=True)
             return
+        await interaction.response.defer(ephemeral=True)
         config = bot.config_manager.get(interaction.guild_id)
-        files = bot.storage_manager.list_files(config)
+        await bot._prepare_vault(config)
+        files = await asyncio.to_thread(bot.storage_manager.list_files, config)
         if not files:
-            await interaction.response.send_message("No files available yet.", ephemeral=True)
+            await interaction.followup.send("No files available yet.", ephemeral=True)
             return
         preview = "\n".join(f"- {path.relative_to(STORAGE_ROOT)}" for path in files[:25])
         more = " (truncated)" if len(files) > 25 else ""
-        await interaction.response.send_message(f"Found {len(files)} files{more}:\n{preview}", ephemeral=True)
+        await interaction.followup.send(f"Found {len(files)} files{more}:\n{preview}", ephemeral=True)
 
     @export_group.command(name="channel")
     @app_commands.describe(channel="Channel", date_range="Optional text filter like 2024-01")
@@ -264,37 +331,42 @@ def build_obsidian_group(bot: ObsidianBot) -> app_commands.Group:
         if interaction.guild_id is None:
             await interaction.response.send_message("Use this command inside a guild.", ephemeral=True)
             return
+        await interaction.response.defer(ephemeral=True)
         config = bot.config_manager.get(interaction.guild_id)
-        files = [path for path in bot.storage_manager.list_files(config) if str(channel.id) in path.stem or channel.name in path.stem]
+        await bot._prepare_vault(config)
+        channel_slug = bot.storage_manager._safe(channel.name)
+        files = await asyncio.to_thread(bot.storage_manager.files_for_channel, config, channel_slug)
         if date_range:
             files = [path for path in files if date_range in path.name]
         if not files:
-            await interaction.response.send_message("No files match the request.", ephemeral=True)
+            await interaction.followup.send("No files match the request.", ephemeral=True)
             return
-        await interaction.response.defer(ephemeral=True)
-        await bot._send_zip(interaction, paths=files, label=f"{channel.name}_export")
+        await bot._send_zip(interaction, config, paths=files, label=f"{channel.name}_export")
 
     @export_group.command(name="all")
     async def export_all(interaction: discord.Interaction) -> None:
         bot._require_permissions(interaction)
+        await interaction.response.defer(ephemeral=True)
         config = bot.config_manager.get(interaction.guild_id)
-        files = bot.storage_manager.list_files(config)
+        await bot._prepare_vault(config)
+        files = await asyncio.to_thread(bot.storage_manager.list_files, config)
         if not files:
-            await interaction.response.send_message("No files available yet.", ephemeral=True)
+            await interaction.followup.send("No files available yet.", ephemeral=True)
             return
-        await interaction.response.defer(ephemeral=True)
-        await bot._send_zip(interaction, paths=files, label=f"guild_{interaction.guild_id}_export")
+        await bot._send_zip(interaction, config, paths=files, label=f"guild_{interaction.guild_id}_export")
 
     @export_group.command(name="search")
     async def export_search(interaction: discord.Interaction, keyword: str) -> None:
         bot._require_permissions(interaction)
+        await interaction.response.defer(ephemeral=True)
         config = bot.config_manager.get(interaction.guild_id)
-        matches = bot.storage_manager.search(config, keyword=keyword)
+        await bot._prepare_vault(config)
+        matches = await asyncio.to_thread(bot.storage_manager.search, config, keyword=keyword)
         if not matches:
-            await interaction.response.send_message("No matches found.", ephemeral=True)
+            await interaction.followup.send("No matches found.", ephemeral=True)
             return
         preview = "\n".join(f"- {path.relative_to(STORAGE_ROOT)}" for path in matches[:20])
-        await interaction.response.send_message(f"Found {len(matches)} files:\n{preview}", ephemeral=True)
+        await interaction.followup.send(f"Found {len(matches)} files:\n{preview}", ephemeral=True)
 
     obsidian.add_command(export_group)
 
@@ -302,10 +374,13 @@ def build_obsidian_group(bot: ObsidianBot) -> app_commands.Group:
     @obsidian.command(name="status")
     async def status(interaction: discord.Interaction) -> None:
         bot._require_permissions(interaction)
+        await interaction.response.defer(ephemeral=True)
         config = bot.config_manager.get(interaction.guild_id)
-        files = bot.storage_manager.list_files(config)
-        total_size = sum(path.stat().st_size for path in files)
-        await interaction.response.send_message(
+        # Render pending binary logs so msgpack guilds are counted too.
+        await bot._prepare_vault(config)
+        files = await asyncio.to_thread(bot.storage_manager.list_files, config)
+        total_size = bot.storage_manager.total_size(config)
+        await interaction.followup.send(
             f"Vault path: {config.vault_path}\n"
             f"Files: {len(files)}\n"
             f"Total size: {total_size / 1024:.1f} KiB",
@@ -322,9 +397,11 @@ def build_obsidian_group(bot: ObsidianBot) -> app_commands.Group:
     @obsidian.command(name="purge")
     async def purge(interaction: discord.Interaction, channel_name: Optional[str] = None) -> None:
         bot._require_permissions(interaction)
+        await interaction.response.defer(ephemeral=True)
         config = bot.config_manager.get(interaction.guild_id)
-        removed = bot.storage_manager.purge(config, channel_name=channel_name)
-        await interaction.response.send_message(f"Removed {removed} files.", ephemeral=True)
+        await bot._prepare_vault(config)
+        removed = await asyncio.to_thread(bot.storage_manager.purge, config, channel_name=channel_name)
+        await interaction.followup.send(f"Removed {removed} files.", ephemeral=True)
 
     @obsidian.command(name="help")
     async def help_command(interaction: discord.Interaction) -> None:
@@ -343,7 +420,7 @@ def build_obsidian_group(bot: ObsidianBot) -> app_commands.Group:
         bot._require_permissions(interaction)
         config = bot.config_manager.get(interaction.guild_id)
         timestamp = datetime.now(timezone.utc)
-        bot.storage_manager.append_message(
+        await bot.storage_manager.append_message_async(
             config,
             channel_name=channel.name,
             message_id=0,
@@ -358,11 +435,11 @@ def build_obsidian_group(bot: ObsidianBot) -> app_commands.Group:
     return obsidian
 
 
-def _parse_channel_ids(raw: str) -> List[int]:
-    ids = []
+def _parse_channel_ids(raw: str) -> Set[int]:
+    ids = set()
     for chunk in raw.replace("<", " ").replace(">", " ").split():
         try:
-            ids.append(int(chunk))
+            ids.add(int(chunk))
         except ValueError:
             continue
     return ids
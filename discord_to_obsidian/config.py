@@ -2,12 +2,36 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
+import os
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, TextIO
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
 
 DEFAULT_FILENAME_TEMPLATE = "{channel}/{year}-{month}-{day}"
+JOURNAL_COMPACT_THRESHOLD = 100
+JOURNAL_FLUSH_DELAY = 0.25
+
+
+def _dumps(payload: Any, *, pretty: bool = False) -> bytes:
+    if orjson is not None:
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2 if pretty else 0
+        return orjson.dumps(payload, option=option)
+    if pretty:
+        return json.dumps(payload, indent=2, sort_keys=True).encode("utf-8")
+    return json.dumps(payload).encode("utf-8")
+
+
+def _loads(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
 
 
 @dataclass
@@ -18,11 +42,12 @@ class GuildConfig:
     vault_path: str = "vaults"
     export_mode: str = "monthly"
     timezone: str = "UTC"
-    include_channels: List[int] = field(default_factory=list)
-    exclude_channels: List[int] = field(default_factory=list)
+    include_channels: Set[int] = field(default_factory=set)
+    exclude_channels: Set[int] = field(default_factory=set)
     admin_role_id: Optional[int] = None
     filename_template: str = DEFAULT_FILENAME_TEMPLATE
     custom_period_days: int = 7
+    storage_format: str = "markdown"
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -30,11 +55,12 @@ class GuildConfig:
             "vault_path": self.vault_path,
             "export_mode": self.export_mode,
             "timezone": self.timezone,
-            "include_channels": self.include_channels,
-            "exclude_channels": self.exclude_channels,
+            "include_channels": sorted(self.include_channels),
+            "exclude_channels": sorted(self.exclude_channels),
             "admin_role_id": self.admin_role_id,
             "filename_template": self.filename_template,
             "custom_period_days": self.custom_period_days,
+            "storage_format": self.storage_format,
         }
 
     @classmethod
@@ -44,42 +70,132 @@ class GuildConfig:
             vault_path=data.get("vault_path", "vaults"),
             export_mode=data.get("export_mode", "monthly"),
             timezone=data.get("timezone", "UTC"),
-            include_channels=list(data.get("include_channels", [])),
-            exclude_channels=list(data.get("exclude_channels", [])),
+            include_channels=set(data.get("include_channels", [])),
+            exclude_channels=set(data.get("exclude_channels", [])),
             admin_role_id=data.get("admin_role_id"),
             filename_template=data.get("filename_template", DEFAULT_FILENAME_TEMPLATE),
             custom_period_days=int(data.get("custom_period_days", 7)),
+            storage_format=data.get("storage_format", "markdown"),
         )
 
 
 class ConfigManager:
-    """Utility that persists configuration for all guilds."""
+    """Utility that persists configuration for all guilds.
+
+    The full configuration lives in a JSON snapshot; individual updates are
+    appended to a JSON-lines journal next to it and folded back into the
+    snapshot by :meth:`compact`.
+    """
 
     def __init__(self, path: Path):
         self.path = path
+        self.journal = path.with_suffix(".jsonl")
         self.path.parent.mkdir(parents=True, exist_ok=True)
         self._cache: Dict[int, GuildConfig] = {}
+        self._journal_handle: Optional[TextIO] = None
+        self._journal_entries = 0
+        self._dirty = False
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._listeners: List[Callable[[int], None]] = []
         self._load()
 
+    def add_listener(self, callback: Callable[[int], None]) -> None:
+        """Register ``callback(guild_id)`` to run after a guild's config is updated."""
+        self._listeners.append(callback)
+
     def _load(self) -> None:
-        if not self.path.exists():
-            self._cache = {}
+        self._cache = {}
+        if self.path.exists():
+            try:
+                payload = _loads(self.path.read_bytes())
+            except json.JSONDecodeError:
+                payload = {}
+            for guild_id, data in payload.items():
+                self._cache[int(guild_id)] = GuildConfig.from_dict(data)
+        self._replay_journal()
+
+    def _replay_journal(self) -> None:
+        if not self.journal.exists():
+            return
+        for line in self.journal.read_bytes().splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = _loads(line)
+            except json.JSONDecodeError:
+                # A torn trailing line from an interrupted write.
+                continue
+            guild_id = int(record["guild_id"])
+            current = self._cache.get(guild_id)
+            data = current.to_dict() if current else {}
+            data.update(record)
+            self._cache[guild_id] = GuildConfig.from_dict(data)
+            self._journal_entries += 1
+
+    def _append_journal(self, guild_id: int, changes: Dict[str, Any]) -> None:
+        if self._journal_handle is None:
+            self._journal_handle = self.journal.open("a", encoding="utf-8")
+        self._journal_handle.write(_dumps({"guild_id": guild_id, **changes}).decode("utf-8") + "\n")
+        self._journal_entries += 1
+        self._dirty = True
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_handle is not None:
             return
         try:
-            payload = json.loads(self.path.read_text())
-        except json.JSONDecodeError:
-            payload = {}
-        for guild_id, data in payload.items():
-            self._cache[int(guild_id)] = GuildConfig.from_dict(data)
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts, maintenance tools): write through immediately.
+            self._flush()
+            return
+        self._flush_handle = loop.call_later(JOURNAL_FLUSH_DELAY, self._flush)
 
-    def _save(self) -> None:
-        serialized = {guild_id: config.to_dict() for guild_id, config in self._cache.items()}
-        self.path.write_text(json.dumps(serialized, indent=2, sort_keys=True))
+    def _flush(self) -> None:
+        """Write out a burst of journal entries at once."""
+        self._flush_handle = None
+        if not self._dirty:
+            return
+        if self._journal_entries >= JOURNAL_COMPACT_THRESHOLD:
+            self.compact()
+        elif self._journal_handle is not None:
+            self._journal_handle.flush()
+        self._dirty = False
+
+    def save_now(self) -> None:
+        """Synchronously persist everything, cancelling any pending delayed flush."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self.compact()
+
+    def compact(self) -> None:
+        """Write a fresh snapshot atomically and empty the journal."""
+        serialized = {str(guild_id): config.to_dict() for guild_id, config in self._cache.items()}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("wb") as handle:
+            handle.write(_dumps(serialized, pretty=True))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, self.path)
+        if self._journal_handle is not None:
+            self._journal_handle.seek(0)
+            self._journal_handle.truncate()
+        else:
+            self.journal.unlink(missing_ok=True)
+        self._journal_entries = 0
+        self._dirty = False
+
+    def close(self) -> None:
+        self.save_now()
+        if self._journal_handle is not None:
+            self._journal_handle.close()
+            self._journal_handle = None
 
     def get(self, guild_id: int) -> GuildConfig:
         if guild_id not in self._cache:
             self._cache[guild_id] = GuildConfig(guild_id=guild_id)
-            self._save()
+            self._append_journal(guild_id, {})
         return self._cache[guild_id]
 
     def update(self, guild_id: int, **kwargs: Any) -> GuildConfig:
@@ -88,7 +204,10 @@ class ConfigManager:
             if hasattr(config, key):
                 setattr(config, key, value)
         self._cache[guild_id] = config
-        self._save()
+        data = config.to_dict()
+        self._append_journal(guild_id, {key: data[key] for key in kwargs if key in data})
+        for callback in self._listeners:
+            callback(guild_id)
         return config
 
     def all_configs(self) -> List[GuildConfig]:
@@ -2,17 +2,34 @@
 
 from __future__ import annotations
 
-import io
+import asyncio
+import contextlib
+import logging
+import mmap
+import os
 import re
 import shutil
+import struct
+import tempfile
+import threading
+import time
 import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import IO, Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from zoneinfo import ZoneInfo
 
-from .config import GuildConfig
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional binary storage
+    msgpack = None
+
+from .config import GuildConfig, _dumps, _loads
 
 MARKDOWN_HEADER = """---
 channel: {channel}
@@ -26,6 +43,202 @@ generated_on: {generated}
 
 SANITIZE_PATTERN = re.compile(r"[^A-Za-z0-9_.-]+")
 
+logger = logging.getLogger(__name__)
+
+PathStrategy = Callable[[datetime, str], Path]
+
+APPEND_BATCH_BYTES = 64 * 1024
+APPEND_MAX_ATTEMPTS = 5
+HANDLE_CACHE_SIZE = 128
+INDEX_FILENAME = ".index.json"
+BINARY_LOG_SUFFIX = ".mpk"
+RENDERING_SUFFIX = ".rendering"
+CORRUPT_SUFFIX = ".corrupt"
+RECORD_LENGTH = struct.Struct("<I")
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _append_bytes(path: Path, data: bytes) -> None:
+    with path.open("ab") as handle:
+        handle.write(data)
+
+
+def _write_all(handle: BinaryIO, data: bytes) -> None:
+    # Unbuffered handles may accept only part of the data per call.
+    view = memoryview(data)
+    while view:
+        view = view[handle.write(view) :]
+
+
+@lru_cache(maxsize=1024)
+def _slugify(value: str) -> str:
+    cleaned = SANITIZE_PATTERN.sub("-", value.strip())
+    return cleaned.strip("-") or "untitled"
+
+
+@lru_cache(maxsize=64)
+def _tz(name: str) -> ZoneInfo:
+    return ZoneInfo(name)
+
+
+def _file_contains(path: Path, pattern: "re.Pattern[bytes]", min_size: int) -> bool:
+    with path.open("rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        if size < min_size:
+            return False
+        if size == 0:
+            return pattern.search(b"") is not None
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return pattern.search(mapped) is not None
+
+
+def _walk_markdown(base: Path) -> Iterator[Tuple[Path, os.stat_result]]:
+    """Yield Markdown files under ``base`` with their stat, using ``os.scandir``."""
+    stack = [str(base)]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except FileNotFoundError:
+            # Removed outside the bot (or never created); nothing to index.
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(".md") and entry.is_file(follow_symlinks=False):
+                    yield Path(entry.path), entry.stat(follow_symlinks=False)
+
+
+def _text_contains(path: Path, keyword_lower: str) -> bool:
+    text = path.read_text(encoding="utf-8", errors="ignore")
+    return keyword_lower in text.lower()
+
+
+class AsyncAppender:
+    """Coalesces appends per file and writes them off the event loop.
+
+    Entries queued during one loop iteration are flushed together on the next
+    one (or as soon as ``batch_bytes`` is exceeded), so a burst of messages to
+    the same file costs a single write on a cached handle in a worker thread.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[Path, bytes], None] = _append_bytes,
+        *,
+        batch_bytes: int = APPEND_BATCH_BYTES,
+        max_attempts: int = APPEND_MAX_ATTEMPTS,
+    ):
+        self._write = write
+        self.batch_bytes = batch_bytes
+        self.max_attempts = max_attempts
+        self._failures: Dict[Path, int] = {}
+        self._pending: Dict[Path, bytearray] = {}
+        self._pending_bytes = 0
+        self._flush_scheduled = False
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def append(self, path: Path, data: bytes) -> None:
+        self._pending.setdefault(path, bytearray()).extend(data)
+        self._pending_bytes += len(data)
+        if self._pending_bytes >= self.batch_bytes:
+            await self.flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task: "asyncio.Task[None]") -> None:
+        self._flush_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Append flush failed", exc_info=task.exception())
+
+    async def flush(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self._flush_scheduled = False
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            self._pending_bytes = 0
+            failed = await asyncio.to_thread(self._write_batch, batch)
+            self._requeue(failed)
+
+    def flush_sync(self) -> None:
+        """Write everything still queued; used when no event loop is running."""
+        batch, self._pending = self._pending, {}
+        self._pending_bytes = 0
+        self._requeue(self._write_batch(batch))
+
+    def _write_batch(self, batch: Dict[Path, bytearray]) -> Dict[Path, bytearray]:
+        """Write each file independently; return the ones to retry on the next flush."""
+        failed = {}
+        for path, data in batch.items():
+            try:
+                self._write(path, bytes(data))
+            except Exception:
+                attempts = self._failures.get(path, 0) + 1
+                if attempts >= self.max_attempts:
+                    # Keep one bad file from holding everything else back forever.
+                    self._failures.pop(path, None)
+                    logger.exception(
+                        "Giving up on %s after %d failed writes; dropping %d queued byte(s)", path, attempts, len(data)
+                    )
+                else:
+                    self._failures[path] = attempts
+                    failed[path] = data
+                    logger.exception(
+                        "Failed to append to %s (attempt %d of %d); keeping it queued", path, attempts, self.max_attempts
+                    )
+            else:
+                self._failures.pop(path, None)
+        return failed
+
+    def _requeue(self, failed: Dict[Path, bytearray]) -> None:
+        if not failed:
+            return
+        # Failed data goes first so it stays ahead of entries queued meanwhile.
+        for path, data in self._pending.items():
+            failed.setdefault(path, bytearray()).extend(data)
+        self._pending = failed
+        self._pending_bytes = sum(len(data) for data in failed.values())
+
+
+@dataclass
+class FileIndexEntry:
+    """Cached metadata for a Markdown file in a guild vault."""
+
+    mtime: float
+    size: int
+    channel: str
+
+
+@dataclass
+class BulkRecord:
+    """A single message queued for :meth:`StorageManager.bulk_append`."""
+
+    channel_name: str
+    message_id: int
+    author: str
+    content: str
+    timestamp: datetime
+    attachments: List[str] = field(default_factory=list)
+    event: str = "message"
+
+
+@dataclass
+class WriteTarget:
+    """Where and how an entry is written, resolved once per message."""
+
+    path: Path
+    channel_slug: str
+    local_time: datetime
+    period: str
+    header_needed: bool
+
 
 class StorageManager:
     """Handles writing Markdown files and preparing exports."""
@@ -33,95 +246,221 @@ class StorageManager:
     def __init__(self, root: Path):
         self.root = root
         self.root.mkdir(parents=True, exist_ok=True)
+        # _lock only guards in-memory bookkeeping and is taken from the event
+        # loop; _io_lock serializes disk writes and the handle cache. When both
+        # are needed, _io_lock is taken first.
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._handles: "OrderedDict[Path, BinaryIO]" = OrderedDict()
+        # Frontmatter already claimed per file (b"" when it has none), kept so
+        # a file deleted outside the bot is recreated with it.
+        self._headers: Dict[Path, bytes] = {}
+        self._pending_headers: Dict[Path, bytes] = {}
+        self._mkdir_cache: Set[Path] = set()
+        self.appender = AsyncAppender(self._write_bytes)
+        self.index_path = self.root / INDEX_FILENAME
+        self._file_index: Dict[int, Dict[Path, FileIndexEntry]] = {}
+        self._index_roots: Dict[int, Path] = {}
+        self._channel_index: Dict[int, Dict[str, List[Path]]] = {}
+        self._scan_backlog: Dict[int, Dict[Path, FileIndexEntry]] = {}
+        self._path_strategies: Dict[int, PathStrategy] = {}
+        self._search_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="vault-search")
+        self._load_index()
 
     # -------------- path helpers --------------
     def _safe(self, value: str) -> str:
-        cleaned = SANITIZE_PATTERN.sub("-", value.strip())
-        return cleaned.strip("-") or "untitled"
+        return _slugify(value)
+
+    def _ensure_dir(self, path: Path) -> None:
+        if path not in self._mkdir_cache:
+            path.mkdir(parents=True, exist_ok=True)
+            self._mkdir_cache.add(path)
 
     def _base_dir(self, guild_id: int, vault_path: str) -> Path:
         path = self.root / str(guild_id) / vault_path
-        path.mkdir(parents=True, exist_ok=True)
+        self._ensure_dir(path)
         return path
 
     def determine_file_path(
         self, config: GuildConfig, *, channel_name: str, timestamp: datetime
     ) -> Path:
-        tz = ZoneInfo(config.timezone)
-        local_time = timestamp.astimezone(tz)
-        channel_slug = self._safe(channel_name)
-        base_dir = self._base_dir(config.guild_id, config.vault_path)
+        local_time = timestamp.astimezone(_tz(config.timezone))
+        return self._path_for_local_time(config, channel_slug=self._safe(channel_name), local_time=local_time)
 
-        year = f"{local_time.year:04d}"
-        month = f"{local_time.month:02d}"
-        day = f"{local_time.day:02d}"
+    def _build_path_strategy(self, config: GuildConfig) -> PathStrategy:
+        """Specialize the export-mode dispatch for one guild's settings."""
+        base_dir = self._base_dir(config.guild_id, config.vault_path)
+        mode = config.export_mode
 
-        if config.export_mode == "single":
-            rel_path = Path(channel_slug + ".md")
-        elif config.export_mode == "daily":
-            rel_path = Path(channel_slug) / f"{year}-{month}-{day}.md"
-        elif config.export_mode == "monthly":
-            rel_path = Path(channel_slug) / f"{year}-{month}.md"
-        elif config.export_mode == "custom":
+        if mode == "single":
+            def strategy(local_time: datetime, channel_slug: str) -> Path:
+                return base_dir / f"{channel_slug}.md"
+        elif mode == "daily":
+            def strategy(local_time: datetime, channel_slug: str) -> Path:
+                return base_dir / channel_slug / (
+                    f"{local_time.year:04d}-{local_time.month:02d}-{local_time.day:02d}.md"
+                )
+        elif mode == "monthly":
+            def strategy(local_time: datetime, channel_slug: str) -> Path:
+                return base_dir / channel_slug / f"{local_time.year:04d}-{local_time.month:02d}.md"
+        elif mode == "custom":
             days = max(1, config.custom_period_days)
-            # Determine bucket start date
-            bucket_start = local_time - timedelta(days=local_time.timetuple().tm_yday % days)
-            rel_path = (
-                Path(channel_slug)
-                / f"{bucket_start.year:04d}-{bucket_start.month:02d}-{bucket_start.day:02d}_d{days}.md"
-            )
+
+            def strategy(local_time: datetime, channel_slug: str) -> Path:
+                # Determine bucket start date
+                bucket_start = local_time - timedelta(days=local_time.timetuple().tm_yday % days)
+                return base_dir / channel_slug / (
+                    f"{bucket_start.year:04d}-{bucket_start.month:02d}-{bucket_start.day:02d}_d{days}.md"
+                )
         else:
-            rel_path = Path(
-                config.filename_template.format(
-                    channel=channel_slug,
-                    year=year,
-                    month=month,
-                    day=day,
+            template = config.filename_template
+
+            def strategy(local_time: datetime, channel_slug: str) -> Path:
+                rel_path = Path(
+                    template.format(
+                        channel=channel_slug,
+                        year=f"{local_time.year:04d}",
+                        month=f"{local_time.month:02d}",
+                        day=f"{local_time.day:02d}",
+                    )
                 )
-            )
-            if not rel_path.suffix:
-                rel_path = rel_path.with_suffix(".md")
+                if not rel_path.suffix:
+                    rel_path = rel_path.with_suffix(".md")
+                return base_dir / rel_path
 
-        path = base_dir / rel_path
-        path.parent.mkdir(parents=True, exist_ok=True)
+        return strategy
+
+    def invalidate_guild(self, guild_id: int) -> None:
+        """Forget per-guild derived state after its configuration changed."""
+        self._path_strategies.pop(guild_id, None)
+
+    def _path_for_local_time(self, config: GuildConfig, *, channel_slug: str, local_time: datetime) -> Path:
+        strategy = self._path_strategies.get(config.guild_id)
+        if strategy is None:
+            strategy = self._path_strategies[config.guild_id] = self._build_path_strategy(config)
+        path = strategy(local_time, channel_slug)
+        self._ensure_dir(path.parent)
         return path
 
     # -------------- writing --------------
-    def _ensure_header(self, path: Path, *, config: GuildConfig, channel_name: str, timestamp: datetime) -> None:
-        if path.exists() and path.stat().st_size > 0:
-            return
-        period = "varies"
+    def _get_handle(self, path: Path) -> BinaryIO:
+        handle = self._handles.get(path)
+        if handle is not None:
+            if os.fstat(handle.fileno()).st_nlink:
+                self._handles.move_to_end(path)
+                return handle
+            # Deleted outside the bot (e.g. from Obsidian): writes to this
+            # handle would vanish, so start a new file instead.
+            del self._handles[path]
+            handle.close()
+        try:
+            handle = path.open("ab", buffering=0)
+        except FileNotFoundError:
+            # The directory was removed behind our back; recreate it.
+            path.parent.mkdir(parents=True, exist_ok=True)
+            handle = path.open("ab", buffering=0)
+        self._handles[path] = handle
+        if len(self._handles) > HANDLE_CACHE_SIZE:
+            _, stale = self._handles.popitem(last=False)
+            stale.close()
+        return handle
+
+    def _write_bytes(self, path: Path, data: bytes) -> None:
+        # Callers already coalesce entries per file and handles are unbuffered,
+        # so the vault is current on disk and nothing is lost if the process dies.
+        with self._io_lock:
+            handle = self._get_handle(path)
+            with self._lock:
+                # Frontmatter is decided here, at write time, so it lands first
+                # no matter which path (appender, bulk, sync) writes first.
+                header = self._headers.get(path)
+                if header is None:
+                    header = self._headers[path] = self._pending_headers.pop(path, b"")
+            start = handle.tell()
+            try:
+                if header and start == 0:
+                    _write_all(handle, header)
+                _write_all(handle, data)
+            except Exception:
+                # Roll back a partial write so the retry neither duplicates
+                # entries nor misaligns length-prefixed binary records.
+                del self._handles[path]
+                with contextlib.suppress(OSError):
+                    os.ftruncate(handle.fileno(), start)
+                with contextlib.suppress(OSError):
+                    handle.close()
+                raise
+
+    def _close_handles(self, paths: Iterable[Path]) -> None:
+        with self._io_lock:
+            for path in paths:
+                handle = self._handles.pop(path, None)
+                if handle is not None:
+                    handle.close()
+                with self._lock:
+                    self._headers.pop(path, None)
+
+    def close(self) -> None:
+        self.appender.flush_sync()
+        with self._io_lock:
+            for handle in self._handles.values():
+                handle.close()
+            self._handles.clear()
+        self._search_pool.shutdown(wait=False)
+        self.save_index()
+
+    def _header_needed(self, path: Path) -> bool:
+        """Whether frontmatter still has to be queued for ``path`` (checked again at write time)."""
+        with self._lock:
+            return path not in self._headers and path not in self._pending_headers
+
+    def _period(self, config: GuildConfig, local_time: datetime) -> str:
         if config.export_mode == "single":
-            period = "all"
-        elif config.export_mode == "daily":
-            period = timestamp.strftime("%Y-%m-%d")
-        elif config.export_mode == "monthly":
-            period = timestamp.strftime("%Y-%m")
-        header = MARKDOWN_HEADER.format(
+            return "all"
+        if config.export_mode == "daily":
+            return f"{local_time.year:04d}-{local_time.month:02d}-{local_time.day:02d}"
+        if config.export_mode == "monthly":
+            return f"{local_time.year:04d}-{local_time.month:02d}"
+        return "varies"
+
+    def _resolve_write_target(self, config: GuildConfig, *, channel_name: str, timestamp: datetime) -> WriteTarget:
+        local_time = timestamp.astimezone(_tz(config.timezone))
+        channel_slug = self._safe(channel_name)
+        path = self._path_for_local_time(config, channel_slug=channel_slug, local_time=local_time)
+        header_needed = self._header_needed(path)
+        period = self._period(config, local_time) if header_needed else ""
+        return WriteTarget(
+            path=path,
+            channel_slug=channel_slug,
+            local_time=local_time,
+            period=period,
+            header_needed=header_needed,
+        )
+
+    def _render_header(self, *, config: GuildConfig, channel_name: str, period: str) -> str:
+        return MARKDOWN_HEADER.format(
             channel=channel_name,
             server=config.guild_id,
             period=period,
             export_mode=config.export_mode,
             generated=datetime.now(timezone.utc).isoformat(),
         )
-        path.write_text(header)
 
-    def append_message(
+    def _format_entry(
         self,
-        config: GuildConfig,
         *,
-        channel_name: str,
         message_id: int,
         author: str,
         content: str,
-        timestamp: datetime,
-        attachments: Optional[List[str]] = None,
-        event: str = "message",
-    ) -> Path:
+        local_time: datetime,
+        attachments: Optional[List[str]],
+        event: str,
+    ) -> str:
         attachments = attachments or []
-        file_path = self.determine_file_path(config, channel_name=channel_name, timestamp=timestamp)
-        self._ensure_header(file_path, config=config, channel_name=channel_name, timestamp=timestamp)
-        stamp = timestamp.strftime("%Y-%m-%d %H:%M")
+        stamp = (
+            f"{local_time.year:04d}-{local_time.month:02d}-{local_time.day:02d} "
+            f"{local_time.hour:02d}:{local_time.minute:02d}"
+        )
         attachments_block = ""
         if attachments:
             attachments_block = "\n".join(f"- Attachment: {url}" for url in attachments)
@@ -134,46 +473,455 @@ class StorageManager:
         if attachments_block:
             entry += attachments_block + "\n"
         entry += "\n"
-        with file_path.open("a", encoding="utf-8") as handle:
-            handle.write(entry)
+        return entry
+
+    def _prepare_entry(
+        self,
+        config: GuildConfig,
+        *,
+        channel_name: str,
+        message_id: int,
+        author: str,
+        content: str,
+        timestamp: datetime,
+        attachments: Optional[List[str]],
+        event: str,
+    ) -> Tuple[Path, bytes]:
+        """Resolve the target file, queue its frontmatter if new, and encode the entry."""
+        target = self._resolve_write_target(config, channel_name=channel_name, timestamp=timestamp)
+        header_size = 0
+        if target.header_needed:
+            header = self._render_header(config=config, channel_name=channel_name, period=target.period)
+            header_bytes = header.encode("utf-8")
+            with self._lock:
+                if self._pending_headers.setdefault(target.path, header_bytes) is header_bytes:
+                    header_size = len(header_bytes)
+        chunk = self._format_entry(
+            message_id=message_id,
+            author=author,
+            content=content,
+            local_time=target.local_time,
+            attachments=attachments,
+            event=event,
+        )
+        data = chunk.encode("utf-8")
+        self._record_write(
+            config, target.path, len(data), channel_slug=target.channel_slug, header_size=header_size
+        )
+        return target.path, data
+
+    def append_message(
+        self,
+        config: GuildConfig,
+        *,
+        channel_name: str,
+        message_id: int,
+        author: str,
+        content: str,
+        timestamp: datetime,
+        attachments: Optional[List[str]] = None,
+        event: str = "message",
+    ) -> Path:
+        file_path, data = self._prepare_entry(
+            config,
+            channel_name=channel_name,
+            message_id=message_id,
+            author=author,
+            content=content,
+            timestamp=timestamp,
+            attachments=attachments,
+            event=event,
+        )
+        self._write_bytes(file_path, data)
         return file_path
 
+    def bulk_append(self, config: GuildConfig, records: Iterable[BulkRecord]) -> None:
+        """Append many messages, issuing one write per target file."""
+        grouped: Dict[Path, List[bytes]] = {}
+        for record in records:
+            file_path, data = self._prepare_entry(
+                config,
+                channel_name=record.channel_name,
+                message_id=record.message_id,
+                author=record.author,
+                content=record.content,
+                timestamp=record.timestamp,
+                attachments=record.attachments,
+                event=record.event,
+            )
+            grouped.setdefault(file_path, []).append(data)
+        for file_path, chunks in grouped.items():
+            self._write_bytes(file_path, b"".join(chunks))
+
+    async def append_message_async(
+        self,
+        config: GuildConfig,
+        *,
+        channel_name: str,
+        message_id: int,
+        author: str,
+        content: str,
+        timestamp: datetime,
+        attachments: Optional[List[str]] = None,
+        event: str = "message",
+    ) -> Path:
+        """Queue an entry on the batched appender instead of writing inline."""
+        file_path, data = self._prepare_entry(
+            config,
+            channel_name=channel_name,
+            message_id=message_id,
+            author=author,
+            content=content,
+            timestamp=timestamp,
+            attachments=attachments,
+            event=event,
+        )
+        await self.appender.append(file_path, data)
+        return file_path
+
+    async def flush(self) -> None:
+        await self.appender.flush()
+
+    # -------------- binary logs --------------
+    @property
+    def binary_supported(self) -> bool:
+        return msgpack is not None
+
+    def _binary_log_path(self, config: GuildConfig, channel_name: str) -> Path:
+        base_dir = self._base_dir(config.guild_id, config.vault_path)
+        return base_dir / f"{self._safe(channel_name)}{BINARY_LOG_SUFFIX}"
+
+    async def append_message_binary(
+        self,
+        config: GuildConfig,
+        *,
+        channel_name: str,
+        message_id: int,
+        author: str,
+        content: str,
+        timestamp: datetime,
+        attachments: Optional[List[str]] = None,
+        event: str = "message",
+    ) -> Path:
+        """Queue a length-prefixed MessagePack record; Markdown is rendered on export."""
+        if msgpack is None:
+            raise RuntimeError("Binary storage requires the msgpack package")
+        packed = msgpack.packb(
+            {
+                "id": message_id,
+                "channel": channel_name,
+                "author": author,
+                "content": content,
+                "ts": (timestamp - EPOCH) // timedelta(microseconds=1),
+                "att": attachments or [],
+                "event": event,
+            }
+        )
+        file_path = self._binary_log_path(config, channel_name)
+        await self.appender.append(file_path, RECORD_LENGTH.pack(len(packed)) + packed)
+        return file_path
+
+    def _read_binary_log(self, path: Path) -> Tuple[List[BulkRecord], bool]:
+        """Decode a log; the flag is False if it stops at damaged or truncated data."""
+        data = path.read_bytes()
+        records = []
+        offset = 0
+        while offset + RECORD_LENGTH.size <= len(data):
+            (length,) = RECORD_LENGTH.unpack_from(data, offset)
+            end = offset + RECORD_LENGTH.size + length
+            if end > len(data):
+                # Partial record from an interrupted write, or a bad length prefix.
+                break
+            try:
+                record = msgpack.unpackb(data[offset + RECORD_LENGTH.size : end])
+                records.append(
+                    BulkRecord(
+                        channel_name=record["channel"],
+                        message_id=record["id"],
+                        author=record["author"],
+                        content=record["content"],
+                        timestamp=EPOCH + timedelta(microseconds=record["ts"]),
+                        attachments=list(record["att"]),
+                        event=record["event"],
+                    )
+                )
+            except (ValueError, KeyError, TypeError, OverflowError):
+                # Length prefixes no longer line up; nothing after this is trustworthy.
+                break
+            offset = end
+        return records, offset == len(data)
+
+    def render_binary_logs(self, config: GuildConfig) -> int:
+        """Convert pending binary logs into Markdown files; returns the number of records."""
+        if msgpack is None:
+            return 0
+        base_dir = self._base_dir(config.guild_id, config.vault_path)
+        rendered = 0
+        # Logs claimed by an earlier pass that failed or was interrupted come first.
+        for claimed in base_dir.glob(f"*{BINARY_LOG_SUFFIX}{RENDERING_SUFFIX}"):
+            rendered += self._render_claimed_log(config, claimed)
+        for log_path in base_dir.glob(f"*{BINARY_LOG_SUFFIX}"):
+            claimed = log_path.with_name(log_path.name + RENDERING_SUFFIX)
+            with self._io_lock:
+                if claimed.exists():
+                    continue
+                # Detach the log from any cached handle so new records start a fresh file.
+                handle = self._handles.pop(log_path, None)
+                if handle is not None:
+                    handle.close()
+                os.replace(log_path, claimed)
+            rendered += self._render_claimed_log(config, claimed)
+        return rendered
+
+    def _render_claimed_log(self, config: GuildConfig, claimed: Path) -> int:
+        records, complete = self._read_binary_log(claimed)
+        self.bulk_append(config, records)
+        # Only drop the log once its records are safely in Markdown.
+        if complete:
+            claimed.unlink()
+        else:
+            # Keep the undecodable remainder for inspection instead of failing
+            # every later render (and every command that triggers one).
+            log_name = claimed.name[: -len(RENDERING_SUFFIX)]
+            aside = claimed.with_name(f"{log_name}.{time.time_ns()}{CORRUPT_SUFFIX}")
+            os.replace(claimed, aside)
+            logger.warning(
+                "Binary log %s is damaged after %d record(s); moved it to %s", log_name, len(records), aside.name
+            )
+        return len(records)
+
+    # -------------- file index --------------
+    def _load_index(self) -> None:
+        # The index is only written by close(), and consumed here so that a
+        # crash or kill leaves no stale snapshot behind: without one, each
+        # guild is rescanned on first use.
+        try:
+            raw = self.index_path.read_bytes()
+        except FileNotFoundError:
+            return
+        self.index_path.unlink()
+        try:
+            payload = _loads(raw)
+        except ValueError:
+            return
+        try:
+            self._load_index_payload(payload)
+        except (KeyError, TypeError, ValueError):
+            # Unreadable or outdated layout: rescan lazily instead.
+            self._file_index.clear()
+            self._index_roots.clear()
+            self._channel_index.clear()
+
+    def _load_index_payload(self, payload: Dict[str, Any]) -> None:
+        for guild_id, data in payload.items():
+            base_dir = self.root / data["base"]
+            if not base_dir.is_dir():
+                continue
+            entries = {
+                base_dir / rel: FileIndexEntry(mtime=mtime, size=size, channel=channel)
+                for rel, (mtime, size, channel) in data["files"].items()
+            }
+            self._set_guild_index(int(guild_id), base_dir, entries)
+
+    def save_index(self) -> None:
+        with self._lock:
+            payload: Dict[str, Any] = {}
+            for guild_id, entries in self._file_index.items():
+                base_dir = self._index_roots[guild_id]
+                payload[str(guild_id)] = {
+                    "base": str(base_dir.relative_to(self.root)),
+                    "files": {
+                        str(path.relative_to(base_dir)): [entry.mtime, entry.size, entry.channel]
+                        for path, entry in entries.items()
+                    },
+                }
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        tmp_path.write_bytes(_dumps(payload))
+        os.replace(tmp_path, self.index_path)
+
+    def _scan_files(self, base_dir: Path) -> Dict[Path, FileIndexEntry]:
+        entries = {}
+        for path, stat in _walk_markdown(base_dir):
+            rel_parts = path.relative_to(base_dir).parts
+            # Channel folders for the built-in modes, bare "<channel>.md" for single files.
+            channel = rel_parts[0] if len(rel_parts) > 1 else path.stem
+            entries[path] = FileIndexEntry(mtime=stat.st_mtime, size=stat.st_size, channel=channel)
+        return entries
+
+    def _set_guild_index(self, guild_id: int, base_dir: Path, entries: Dict[Path, FileIndexEntry]) -> None:
+        channels: Dict[str, List[Path]] = {}
+        for path, entry in entries.items():
+            channels.setdefault(entry.channel, []).append(path)
+        self._file_index[guild_id] = entries
+        self._index_roots[guild_id] = base_dir
+        self._channel_index[guild_id] = channels
+
+    def _loaded_index(self, config: GuildConfig) -> Optional[Dict[Path, FileIndexEntry]]:
+        """The guild's index if it is current; call with ``self._lock`` held."""
+        base_dir = self.root / str(config.guild_id) / config.vault_path
+        if self._index_roots.get(config.guild_id) != base_dir:
+            return None
+        return self._file_index[config.guild_id]
+
+    def _guild_index(self, config: GuildConfig) -> Dict[Path, FileIndexEntry]:
+        base_dir = self._base_dir(config.guild_id, config.vault_path)
+        with self._lock:
+            index = self._loaded_index(config)
+        if index is not None:
+            return index
+        # Scan without the lock: writers on the event loop must not wait for it.
+        entries = self._scan_files(base_dir)
+        with self._lock:
+            index = self._loaded_index(config)
+            if index is not None:
+                return index
+            # Files written while the scan ran that it did not pick up.
+            for path, entry in self._scan_backlog.pop(config.guild_id, {}).items():
+                if base_dir in path.parents:
+                    entries.setdefault(path, entry)
+            self._set_guild_index(config.guild_id, base_dir, entries)
+            return entries
+
+    def _record_write(
+        self, config: GuildConfig, path: Path, size: int, *, channel_slug: str, header_size: int = 0
+    ) -> None:
+        with self._lock:
+            if self._bump_index_entry(config, path, size):
+                return
+        # First write to a file the index does not know yet. It may predate the
+        # index (created outside the bot), so stat it, but not under the lock.
+        try:
+            existing = path.stat().st_size
+        except FileNotFoundError:
+            existing = 0
+        new_entry = FileIndexEntry(mtime=time.time(), size=size + (existing or header_size), channel=channel_slug)
+        with self._lock:
+            if self._bump_index_entry(config, path, size):
+                return
+            index = self._loaded_index(config)
+            if index is None:
+                # Never scan from here (this runs on the event loop); remember
+                # the write so the next scan can account for it.
+                self._scan_backlog.setdefault(config.guild_id, {})[path] = new_entry
+                return
+            index[path] = new_entry
+            self._channel_index[config.guild_id].setdefault(channel_slug, []).append(path)
+
+    def _bump_index_entry(self, config: GuildConfig, path: Path, size: int) -> bool:
+        """Add ``size`` bytes to a known entry; call with ``self._lock`` held."""
+        index = self._loaded_index(config)
+        if index is None:
+            index = self._scan_backlog.get(config.guild_id, {})
+        entry = index.get(path)
+        if entry is None:
+            return False
+        entry.mtime = time.time()
+        entry.size += size
+        return True
+
+    def _forget_files(self, config: GuildConfig, paths: Iterable[Path]) -> None:
+        index = self._guild_index(config)
+        with self._lock:
+            channels = self._channel_index[config.guild_id]
+            for path in paths:
+                entry = index.pop(path, None)
+                if entry is None:
+                    continue
+                channel_paths = channels.get(entry.channel, [])
+                if path in channel_paths:
+                    channel_paths.remove(path)
+                if not channel_paths:
+                    channels.pop(entry.channel, None)
+
     # -------------- exports --------------
     def list_files(self, config: GuildConfig) -> List[Path]:
-        base_dir = self._base_dir(config.guild_id, config.vault_path)
-        return [p for p in base_dir.rglob("*.md") if p.is_file()]
+        index = self._guild_index(config)
+        with self._lock:
+            return list(index)
+
+    def total_size(self, config: GuildConfig) -> int:
+        """Vault size in bytes, summed from the index rather than stat calls."""
+        index = self._guild_index(config)
+        with self._lock:
+            return sum(entry.size for entry in index.values())
+
+    def files_for_channel(self, config: GuildConfig, channel_slug: str) -> List[Path]:
+        self._guild_index(config)
+        with self._lock:
+            return list(self._channel_index[config.guild_id].get(channel_slug, []))
 
     def search(self, config: GuildConfig, *, keyword: str) -> List[Path]:
-        keyword_lower = keyword.lower()
-        matches = []
-        for path in self.list_files(config):
-            text = path.read_text(encoding="utf-8", errors="ignore")
-            if keyword_lower in text.lower():
-                matches.append(path)
-        return matches
-
-    def zip_paths(self, paths: Iterable[Path]) -> io.BytesIO:
-        buffer = io.BytesIO()
-        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        paths = self.list_files(config)
+        if keyword.isascii():
+            # ASCII keywords can be matched case-insensitively on the raw bytes
+            # without decoding; anything else needs Unicode case folding.
+            needle = keyword.encode("utf-8")
+            pattern = re.compile(re.escape(needle), re.IGNORECASE)
+            matcher = partial(_file_contains, pattern=pattern, min_size=len(needle))
+        else:
+            matcher = partial(_text_contains, keyword_lower=keyword.lower())
+
+        def scan(path: Path) -> Optional[bool]:
+            try:
+                return matcher(path)
+            except FileNotFoundError:
+                return None
+
+        hits = list(self._search_pool.map(scan, paths))
+        # Files removed outside the bot since the index was built.
+        self._forget_files(config, [path for path, hit in zip(paths, hits) if hit is None])
+        return [path for path, hit in zip(paths, hits) if hit]
+
+    def zip_paths(self, config: GuildConfig, paths: Iterable[Path]) -> IO[bytes]:
+        """Build a ZIP archive in an anonymous temporary file rather than in memory."""
+        # TemporaryFile (unlike SpooledTemporaryFile before Python 3.11) is an
+        # io.IOBase, which discord.File requires.
+        buffer = tempfile.TemporaryFile()
+        missing = []
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
             for path in paths:
-                archive.write(path, arcname=str(path.relative_to(self.root)))
+                try:
+                    archive.write(path, arcname=str(path.relative_to(self.root)))
+                except FileNotFoundError:
+                    # Removed outside the bot since the index was built.
+                    missing.append(path)
+        self._forget_files(config, missing)
         buffer.seek(0)
         return buffer
 
     def purge(self, config: GuildConfig, *, channel_name: Optional[str] = None) -> int:
         paths = self.list_files(config)
-        removed = 0
+        channel_slug = self._safe(channel_name) if channel_name else None
+        removed = []
         for path in paths:
-            if channel_name and self._safe(channel_name) not in path.parts:
+            if channel_slug and channel_slug not in path.parts:
                 continue
+            self._close_handles([path])
             path.unlink(missing_ok=True)
-            removed += 1
-        return removed
+            removed.append(path)
+        self._forget_files(config, removed)
+        return len(removed)
 
     def clear_cache(self, config: GuildConfig) -> None:
         cache_dir = self._base_dir(config.guild_id, config.vault_path) / ".cache"
         if cache_dir.exists():
             shutil.rmtree(cache_dir)
+        guild_root = self.root / str(config.guild_id)
+        # Forget everything remembered about this guild's files so folders
+        # deleted outside the bot are recreated and the vault is rescanned.
+        self._mkdir_cache = {
+            path for path in self._mkdir_cache if path != guild_root and guild_root not in path.parents
+        }
+        with self._io_lock:
+            open_paths = [path for path in self._handles if guild_root in path.parents]
+        self._close_handles(open_paths)
+        with self._lock:
+            self._headers = {
+                path: header for path, header in self._headers.items() if guild_root not in path.parents
+            }
+            self._file_index.pop(config.guild_id, None)
+            self._index_roots.pop(config.guild_id, None)
+            self._channel_index.pop(config.guild_id, None)
 
 
-__all__ = ["StorageManager", "MARKDOWN_HEADER"]
+__all__ = ["BulkRecord", "StorageManager", "MARKDOWN_HEADER"]